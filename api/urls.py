@@ -1,9 +1,10 @@
 from django.urls import path
 from . import views
-from .views import YouTubeSearchAPIView, YouTubeDownloadAPIView
+from .views import YouTubeAutocompleteAPIView, YouTubeSearchAPIView, YouTubeDownloadAPIView
 
 urlpatterns = [
     # path('example/', views.example_view, name='example_view'),
     path('youtube-search/', YouTubeSearchAPIView.as_view(), name='youtube_search'),
+    path('youtube-autocomplete/', YouTubeAutocompleteAPIView.as_view(), name='youtube_autocomplete'),
     path('youtube-download/', YouTubeDownloadAPIView.as_view(), name='youtube_download'),
 ]
\ No newline at end of file
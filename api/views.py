@@ -1,36 +1,112 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render
 from django.http import JsonResponse, FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from yt_dlp import YoutubeDL
+from master.autocomplete import record_query, suggest
 import os
 
+SEARCH_FIELDS = ('title', 'url', 'id', 'duration', 'thumbnails', 'channel')
+DEFAULT_SEARCH_FIELDS = ('title', 'url', 'id')
+
+def search_entries(query):
+    """
+    Returns (entries, fetched_at) for a query. The flat yt-dlp entries are
+    trimmed to SEARCH_FIELDS and cached, so repeat searches (and 304 checks)
+    never go back to YouTube until the cache expires.
+    """
+    cache_key = 'api_search:' + hashlib.md5(query.encode('utf-8')).hexdigest()
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Imported lazily, see master.views.search_results
+    from yt_dlp import YoutubeDL
+
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': True,
+        'skip_download': True,
+    }
+
+    with YoutubeDL(ydl_opts) as ydl:
+        search_results = ydl.extract_info(f"ytsearch10:{query}", download=False)
+
+    entries = [
+        {field: entry.get(field) for field in SEARCH_FIELDS}
+        for entry in search_results.get('entries', [])
+    ]
+    # HTTP dates only have second precision, so drop the microseconds
+    fetched_at = int(time.time())
+    cache.set(cache_key, (entries, fetched_at), settings.SEARCH_CACHE_SECONDS)
+    return entries, fetched_at
+
 class YouTubeSearchAPIView(APIView):
+    # Anonymous and read-only: skipping DRF's session auth keeps the session
+    # untouched, so responses don't get `Vary: Cookie` and a CDN can share them
+    authentication_classes = []
+    permission_classes = []
+
     def get(self, request):
         query = request.GET.get('query', '')
         if not query:
             return Response({"error": "Query parameter is required."}, status=400)
 
-        ydl_opts = {
-            'quiet': True,
-            'extract_flat': True,
-            'skip_download': True,
-        }
+        raw_fields = request.GET.get('fields', '')
+        fields = [field.strip() for field in raw_fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in SEARCH_FIELDS]
+        if unknown:
+            return Response({
+                "error": f"Unknown fields: {', '.join(unknown)}.",
+                "allowed_fields": SEARCH_FIELDS,
+            }, status=400)
+        # No field names at all (missing, or just "," / spaces) means the defaults
+        fields = fields or DEFAULT_SEARCH_FIELDS
 
-        with YoutubeDL(ydl_opts) as ydl:
-            try:
-                search_results = ydl.extract_info(f"ytsearch10:{query}", download=False)
-                videos = [
-                    {
-                        'title': entry['title'],
-                        'url': entry['url'],
-                        'id': entry['id']
-                    }
-                    for entry in search_results.get('entries', [])
-                ]
-                return Response({"videos": videos})
-            except Exception as e:
-                return Response({"error": str(e)}, status=500)
+        try:
+            entries, fetched_at = search_entries(query)
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
+
+        videos = [{field: entry[field] for field in fields} for entry in entries]
+
+        # The ETag is a hash of the exact payload, so it changes with ?fields= too
+        payload = json.dumps(videos, sort_keys=True, default=str).encode('utf-8')
+        etag = f'"{hashlib.md5(payload).hexdigest()}"'
+
+        response = Response({"videos": videos})
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(fetched_at)
+        patch_cache_control(response, public=True, max_age=settings.SEARCH_CACHE_SECONDS)
+        patch_vary_headers(response, ('Accept',))
+
+        # Returns a bare 304 (keeping the caching headers) when the client is up to date
+        response = get_conditional_response(request, etag=etag, last_modified=fetched_at, response=response)
+
+        # Only a full result counts as a search; revalidations would inflate autocomplete
+        if response.status_code == 200:
+            record_query(query)
+        return response
+
+class YouTubeAutocompleteAPIView(APIView):
+    # Anonymous and read-only, like YouTubeSearchAPIView
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        query = request.GET.get('query', '')
+        try:
+            limit = int(request.GET.get('limit', 10))
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+
+        return Response({"query": query, "suggestions": suggest(query, limit)})
 
 class YouTubeDownloadAPIView(APIView):
     def post(self, request):
@@ -38,6 +114,8 @@ class YouTubeDownloadAPIView(APIView):
         if not title:
             return Response({"error": "Title parameter is required."}, status=400)
 
+        from yt_dlp import YoutubeDL
+
         ydl_opts = {
             'quiet': True,
             'format': 'best',
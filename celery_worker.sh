@@ -0,0 +1,33 @@
+#!/usr/bin/env bash
+# Starts a Celery worker for one workload (queues are routed in settings.CELERY_TASK_ROUTES).
+# Usage: ./celery_worker.sh llm|images|default|beat
+# Concurrency can be overridden per profile, e.g. LLM_CONCURRENCY=4 ./celery_worker.sh llm
+set -o errexit
+
+APP=youtube_search_download
+
+case "$1" in
+  llm)
+    # Long Gemini calls: few slots, take one task at a time
+    exec celery -A $APP worker -Q llm -n llm@%h \
+      --concurrency "${LLM_CONCURRENCY:-2}" --prefetch-multiplier 1 -O fair \
+      --max-tasks-per-child 50
+    ;;
+  images)
+    # Wikipedia lookups: mostly waiting on the network
+    exec celery -A $APP worker -Q images -n images@%h \
+      --concurrency "${IMAGES_CONCURRENCY:-4}" --prefetch-multiplier 1 -O fair
+    ;;
+  default)
+    # Short housekeeping jobs (leaderboard flush, ...)
+    exec celery -A $APP worker -Q default -n default@%h \
+      --concurrency "${DEFAULT_CONCURRENCY:-2}" --prefetch-multiplier 4
+    ;;
+  beat)
+    exec celery -A $APP beat
+    ;;
+  *)
+    echo "Usage: $0 llm|images|default|beat" >&2
+    exit 1
+    ;;
+esac
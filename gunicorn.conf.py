@@ -0,0 +1,31 @@
+# Gunicorn picks this file up automatically when started from the project root.
+import os
+
+# Load the Django app in the master so workers fork with it already imported.
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+# Sync workers are killed after `timeout` seconds on a single request. Video
+# downloads (/yt/download/, and above all /yt/download-batch/, which streams a
+# ZIP of several videos) take minutes, so the 30s default is far too short.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
+
+# Import yt-dlp, google-genai, pydantic and requests in the master before any
+# worker is forked (set GUNICORN_WARMUP=False to skip).
+warm_up_enabled = os.getenv("GUNICORN_WARMUP", "True") == "True"
+
+def on_starting(server):
+    if not warm_up_enabled:
+        return
+
+    from youtube_search_download.warmup import warm_up
+
+    timings = warm_up()
+    total = sum(timings.values()) * 1000
+    server.log.info("Warm-up imported %s in %.0f ms", ", ".join(timings), total)
+
+def post_worker_init(worker):
+    # Load the search autocomplete index in the background as soon as the
+    # worker is up, so the first lookups don't find it empty
+    from master.autocomplete import start_refresher
+
+    start_refresher()
@@ -0,0 +1,205 @@
+"""
+Search autocomplete served from memory.
+
+Queries sent to search_results and YouTubeSearchAPIView are counted in the
+SearchQuery table. Each process keeps them in a sorted list with a parallel
+list of counts, so the queries starting with a prefix are one bisect away and
+a suggestion lookup never touches the database or yt-dlp. A background thread
+loads the index and tops it up with the rows that changed since the last sync
+every AUTOCOMPLETE_REFRESH_SECONDS, so no request ever waits for a rebuild.
+"""
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SearchQuery
+
+MAX_QUERY_LENGTH = 200
+# Sorts after any character a query can contain, for the end of a prefix range
+_PREFIX_END = '\U0010ffff'
+
+def normalize_query(query):
+    return re.sub(r'\s+', ' ', query or '').strip().lower()
+
+class PrefixIndex:
+    """
+    Sorted queries plus their counts. A lookup bisects the range of queries
+    starting with the prefix and takes the most searched ones: small ranges
+    are scanned directly, the top `size` of larger ones (short prefixes like
+    "a") are computed once and then kept up to date on every count change.
+    """
+    def __init__(self, size=10, scan_limit=500, max_queries=None):
+        self.size = size
+        self.scan_limit = scan_limit
+        # New queries are ignored once the index holds this many; the periodic
+        # full reload (refresh_index) brings in the ones that became popular
+        self.max_queries = max_queries
+        self.queries = []
+        self.counts = []
+        # prefix -> [(-count, query), ...] best first, only for large ranges
+        self.top = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.queries)
+
+    def load(self, rows):
+        """Replaces the whole index with (query, count) rows."""
+        ordered = sorted(rows)
+        with self.lock:
+            self.queries = [query for query, _ in ordered]
+            self.counts = [count for _, count in ordered]
+            self.top = {}
+
+    def update(self, query, count):
+        with self.lock:
+            position = bisect.bisect_left(self.queries, query)
+            if position < len(self.queries) and self.queries[position] == query:
+                previous = self.counts[position]
+                if count <= previous:
+                    return
+                self.counts[position] = count
+            else:
+                if self.max_queries is not None and len(self.queries) >= self.max_queries:
+                    return
+                previous = 0
+                self.queries.insert(position, query)
+                self.counts.insert(position, count)
+
+            for end in range(len(query) + 1):
+                top = self.top.get(query[:end])
+                if top is not None:
+                    self._offer(top, query, count, previous)
+
+    def increment(self, query, amount=1):
+        with self.lock:
+            position = bisect.bisect_left(self.queries, query)
+            found = position < len(self.queries) and self.queries[position] == query
+            count = (self.counts[position] if found else 0) + amount
+        self.update(query, count)
+
+    def _offer(self, top, query, count, previous):
+        if previous:
+            try:
+                top.remove((-previous, query))
+            except ValueError:
+                pass
+
+        entry = (-count, query)
+        if len(top) < self.size or entry < top[-1]:
+            bisect.insort(top, entry)
+            del top[self.size:]
+
+    def _best(self, start, end, limit):
+        # nlargest is stable, so equal counts stay in alphabetical order
+        positions = heapq.nlargest(limit, range(start, end), key=self.counts.__getitem__)
+        return [(-self.counts[position], self.queries[position]) for position in positions]
+
+    def suggest(self, prefix, limit=10):
+        with self.lock:
+            start = bisect.bisect_left(self.queries, prefix)
+            end = bisect.bisect_left(self.queries, prefix + _PREFIX_END, start)
+            if end - start <= self.scan_limit:
+                return [query for _, query in self._best(start, end, limit)]
+
+            top = self.top.get(prefix)
+            if top is None:
+                top = self.top[prefix] = self._best(start, end, self.size)
+            return [query for _, query in top[:limit]]
+
+_index = PrefixIndex(size=settings.AUTOCOMPLETE_MAX_SUGGESTIONS, max_queries=settings.AUTOCOMPLETE_MAX_QUERIES)
+_refresh_lock = threading.Lock()
+_start_lock = threading.Lock()
+_synced_at = None
+_loaded_at = 0.0
+# pid of the process whose refresher thread is running (threads don't survive a fork)
+_refresher_pid = None
+
+def refresh_index():
+    """
+    Loads the SearchQuery rows changed since the last sync into the in-memory
+    index. The first call, and one every AUTOCOMPLETE_RELOAD_SECONDS after
+    that, reloads the AUTOCOMPLETE_MAX_QUERIES most searched queries instead.
+    """
+    global _synced_at, _loaded_at
+
+    with _refresh_lock:
+        try:
+            started = timezone.now()
+            rows = SearchQuery.objects.order_by('-count')
+            if _synced_at is None or time.monotonic() - _loaded_at >= settings.AUTOCOMPLETE_RELOAD_SECONDS:
+                _index.load(rows[:settings.AUTOCOMPLETE_MAX_QUERIES].values_list('query', 'count'))
+                _loaded_at = time.monotonic()
+            else:
+                changed = rows.filter(last_searched__gte=_synced_at)
+                for query, count in changed.values_list('query', 'count').iterator():
+                    _index.update(query, count)
+
+            _synced_at = started
+        except DatabaseError as e:
+            print(f"Autocomplete refresh failed: {e}")
+
+def _refresh_forever():
+    while True:
+        refresh_index()
+        # Don't hold a connection open between refreshes
+        connection.close()
+        time.sleep(settings.AUTOCOMPLETE_REFRESH_SECONDS)
+
+def start_refresher():
+    """
+    Starts the background thread that keeps this process's index fresh.
+    Safe to call repeatedly; called from gunicorn's post_worker_init and, for
+    other servers, on the first lookup (which answers from the empty index
+    rather than waiting for the load).
+    """
+    global _refresher_pid
+
+    with _start_lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+
+    threading.Thread(target=_refresh_forever, name='autocomplete-refresh', daemon=True).start()
+
+def get_index():
+    start_refresher()
+    return _index
+
+def record_query(query):
+    """
+    Counts one search for `query`. A failure here must never break the search itself.
+    """
+    query = normalize_query(query)
+    if not query or len(query) > MAX_QUERY_LENGTH:
+        return
+
+    try:
+        updated = SearchQuery.objects.filter(query=query).update(count=F('count') + 1, last_searched=timezone.now())
+        if not updated:
+            try:
+                SearchQuery.objects.create(query=query)
+            except IntegrityError:
+                # Someone else created it in the meantime
+                SearchQuery.objects.filter(query=query).update(count=F('count') + 1, last_searched=timezone.now())
+    except DatabaseError as e:
+        print(f"Could not record search '{query}': {e}")
+        return
+
+    # Show it in this process right away; other processes pick it up on their next refresh
+    _index.increment(query)
+
+def suggest(prefix, limit=10):
+    prefix = normalize_query(prefix)
+    if not prefix:
+        return []
+    limit = max(0, min(limit, settings.AUTOCOMPLETE_MAX_SUGGESTIONS))
+    return get_index().suggest(prefix, limit)
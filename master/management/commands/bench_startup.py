@@ -0,0 +1,71 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a brand new interpreter so nothing is already imported.
+# Prints the timings as JSON on the last line of stdout.
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+
+import django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'youtube_search_download.settings')
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns  # imports every app's views, like a worker's first request would
+ready = time.perf_counter()
+
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+request_start = time.perf_counter()
+response = Client().get(sys.argv[1])
+first_request = time.perf_counter()
+
+heavy = ('yt_dlp', 'google.genai', 'pydantic', 'requests')
+print(json.dumps({
+    'cold_start': ready - start,
+    'first_request': first_request - request_start,
+    'status': response.status_code,
+    'heavy_loaded': [name for name in heavy if name in sys.modules],
+}))
+'''
+
+class Command(BaseCommand):
+    help = "Measures worker cold start (Django setup + URLconf import) and first-request latency in fresh interpreters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Number of fresh interpreters to sample.")
+        parser.add_argument('--path', default='/yt/', help="URL requested as the first request.")
+        parser.add_argument('--json', action='store_true', help="Print the raw samples as JSON.")
+
+    def handle(self, *args, **options):
+        samples = []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', PROBE, options['path']],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                self.stderr.write(result.stderr)
+                raise SystemExit(result.returncode)
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        if options['json']:
+            self.stdout.write(json.dumps(samples, indent=2))
+            return
+
+        for key in ('cold_start', 'first_request'):
+            values = [sample[key] * 1000 for sample in samples]
+            self.stdout.write(
+                f"{key:<14} median {statistics.median(values):8.1f} ms   "
+                f"min {min(values):8.1f} ms   max {max(values):8.1f} ms"
+            )
+        self.stdout.write(f"first response status: {samples[-1]['status']}")
+        self.stdout.write(f"heavy modules loaded: {', '.join(samples[-1]['heavy_loaded']) or 'none'}")
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, unique=True)),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('last_searched', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,13 @@
 from django.db import models
 
-# Create your models here.
+class SearchQuery(models.Model):
+    """
+    Every distinct (normalized) search made on the YouTube pages and API,
+    with how often it was searched. Feeds the autocomplete index.
+    """
+    query = models.CharField(max_length=200, unique=True)
+    count = models.PositiveIntegerField(default=1)
+    last_searched = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.query} ({self.count})"
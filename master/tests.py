@@ -1,3 +1,53 @@
-from django.test import TestCase
+import random
+import string
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .autocomplete import PrefixIndex
+
+class PrefixIndexTests(SimpleTestCase):
+    def reference(self, counts, prefix, limit):
+        """Brute force: most searched first, then alphabetical."""
+        matches = sorted((-count, query) for query, count in counts.items() if query.startswith(prefix))
+        return [query for _, query in matches[:limit]]
+
+    def test_matches_brute_force_under_random_updates(self):
+        rng = random.Random(1234)
+        # A small alphabet gives long shared prefixes, so both the scanned and
+        # the cached top-k paths (ranges above scan_limit) get exercised
+        alphabet = 'abc '
+        index = PrefixIndex(size=5, scan_limit=20)
+        counts = {}
+
+        def random_query():
+            return ''.join(rng.choices(alphabet, k=rng.randint(1, 6)))
+
+        index.load((query, rng.randint(1, 50)) for query in {random_query() for _ in range(200)})
+        counts.update(zip(index.queries, index.counts))
+
+        for _ in range(20000):
+            action = rng.random()
+            if action < 0.4:
+                query = random_query()
+                index.increment(query)
+                counts[query] = counts.get(query, 0) + 1
+            elif action < 0.5:
+                query = rng.choice(list(counts))
+                count = counts[query] + rng.randint(-5, 20)
+                index.update(query, count)
+                # Counts never go down
+                counts[query] = max(counts[query], count)
+            else:
+                prefix = ''.join(rng.choices(alphabet, k=rng.randint(0, 3)))
+                limit = rng.randint(0, 5)
+                self.assertEqual(index.suggest(prefix, limit), self.reference(counts, prefix, limit), prefix)
+
+    def test_new_queries_are_ignored_once_full(self):
+        index = PrefixIndex(size=5, max_queries=2)
+        index.load([('cats', 3), ('dogs', 1)])
+
+        index.increment('cars', 10)
+        index.increment('dogs', 5)
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.suggest('', 5), ['dogs', 'cats'])
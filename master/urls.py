@@ -4,5 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.homepage, name='homepage'),
     path('search-results/', views.search_results, name='search_results'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
     path('download/', views.download_video, name='download_video'),
+    path('download-batch/', views.download_batch, name='download_batch'),
 ]
\ No newline at end of file
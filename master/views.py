@@ -1,36 +1,80 @@
+import hashlib
+import itertools
 import os
+import re
 import tempfile
 import shutil  # <--- Added to copy the file
+import threading
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, redirect
-from django.http import StreamingHttpResponse
-from yt_dlp import YoutubeDL
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .autocomplete import record_query, suggest
 
 def homepage(request):
     return render(request, 'master/homepage.html')
 
+def search_results_html(query):
+    """
+    Returns the rendered result list for a query. The HTML is the same for
+    every visitor, so it is cached per query and a cache hit skips both the
+    yt-dlp search and the template render.
+    """
+    cache_key = 'search_results_html:' + hashlib.md5(query.encode('utf-8')).hexdigest()
+    html = cache.get(cache_key)
+    if html is not None:
+        return mark_safe(html)
+
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': True,
+        'skip_download': True,
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android', 'web'],
+            }
+        }
+    }
+    try:
+        # yt-dlp is imported on first use: it costs several hundred ms at
+        # import time and most requests (game, admin) never need it
+        from yt_dlp import YoutubeDL
+
+        with YoutubeDL(ydl_opts) as ydl:
+            search_results = ydl.extract_info(f"ytsearch10:{query}", download=False)
+            results = search_results.get('entries', [])
+    except Exception as e:
+        print(f"Search Error: {e}")
+        # Don't cache a failed search
+        return render_to_string('master/results_list.html', {'results': []})
+
+    html = render_to_string('master/results_list.html', {'results': results})
+    cache.set(cache_key, html, settings.SEARCH_CACHE_SECONDS)
+    return html
+
 def search_results(request):
     query = request.GET.get('query')
-    results = []
+    results_html = ''
     if query:
-        ydl_opts = {
-            'quiet': True,
-            'extract_flat': True,
-            'skip_download': True,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web'],
-                }
-            }
-        }
-        try:
-            with YoutubeDL(ydl_opts) as ydl:
-                search_results = ydl.extract_info(f"ytsearch10:{query}", download=False)
-                results = search_results.get('entries', [])
-        except Exception as e:
-            print(f"Search Error: {e}")
-            
-    return render(request, 'master/results.html', {'results': results, 'query': query})
+        record_query(query)
+        results_html = search_results_html(query)
+
+    return render(request, 'master/results.html', {'results_html': results_html, 'query': query})
+
+def autocomplete(request):
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        # Same answer as api.views.YouTubeAutocompleteAPIView
+        return JsonResponse({'error': "limit must be an integer."}, status=400)
+    query = request.GET.get('query', '')
+    return JsonResponse({'query': query, 'suggestions': suggest(query, limit)})
 
 def stream_and_delete(file_path, temp_cookie_path=None):
     """
@@ -53,45 +97,45 @@ def stream_and_delete(file_path, temp_cookie_path=None):
         if temp_cookie_path and os.path.exists(temp_cookie_path):
             os.remove(temp_cookie_path)
 
-def download_video(request):
-    video_url = request.GET.get('url')
-    
-    if not video_url:
-        return redirect('homepage')
-
-    # 1. SETUP PATHS
-    temp_dir = tempfile.gettempdir()
-    
-    # Identify where the read-only source cookies are
+def prepare_cookie_file():
+    """
+    Copies the read-only cookies file (Render secret or local) to a writable
+    temp path, because yt-dlp rewrites the cookie jar when it finishes.
+    Returns the temp path, or None if no cookies are configured.
+    """
     render_secret_path = '/etc/secrets/cookies.txt'
     local_path = os.path.join(settings.BASE_DIR, 'cookies.txt')
-    
+
     source_cookies = None
     if os.path.exists(render_secret_path):
         source_cookies = render_secret_path
     elif os.path.exists(local_path):
         source_cookies = local_path
 
-    # 2. COPY COOKIES TO TEMP (Crucial Fix)
-    writable_cookie_path = None
-    if source_cookies:
-        try:
-            # Create a temp file path (e.g., /tmp/cookies_12345.txt)
-            writable_cookie_path = os.path.join(temp_dir, f"cookies_{os.getpid()}.txt")
-            # Copy the read-only file to the writable temp location
-            shutil.copyfile(source_cookies, writable_cookie_path)
-        except Exception as e:
-            print(f"Error copying cookies: {e}")
-
-    # 3. CONFIGURE YT-DLP
-    ydl_opts = {
-        'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
+    if not source_cookies:
+        return None
+
+    try:
+        # Create a temp file path (e.g., /tmp/cookies_12345_<uuid>.txt)
+        writable_cookie_path = os.path.join(
+            tempfile.gettempdir(), f"cookies_{os.getpid()}_{uuid.uuid4().hex}.txt"
+        )
+        # Copy the read-only file to the writable temp location
+        shutil.copyfile(source_cookies, writable_cookie_path)
+        return writable_cookie_path
+    except Exception as e:
+        print(f"Error copying cookies: {e}")
+        return None
+
+def download_options(output_dir, cookie_path=None):
+    return {
+        'outtmpl': os.path.join(output_dir, '%(title)s.%(ext)s'),
         'restrictfilenames': True,
         'format': 'best[ext=mp4]/best',
-        
+
         # Point to the WRITABLE temp file, not the read-only source
-        'cookiefile': writable_cookie_path,
-        
+        'cookiefile': cookie_path,
+
         'quiet': True,
         'no_warnings': True,
         'nocheckcertificate': True,
@@ -99,37 +143,57 @@ def download_video(request):
         'extractor_args': {
             'youtube': {
                 'player_client': ['android', 'ios'],
-                'skip': ['dash', 'hls'], 
+                'skip': ['dash', 'hls'],
             }
         },
     }
 
+def fetch_video_file(video_url, ydl_opts):
+    """
+    Downloads a single video and returns the path of the file on disk.
+    """
+    from yt_dlp import YoutubeDL
+
+    with YoutubeDL(ydl_opts) as ydl:
+        info_dict = ydl.extract_info(video_url, download=True)
+        file_path = ydl.prepare_filename(info_dict)
+
+        # Sanity check for filename changes
+        if not os.path.exists(file_path):
+            base, _ = os.path.splitext(file_path)
+            for ext in ['.mp4', '.mkv', '.webm']:
+                if os.path.exists(base + ext):
+                    file_path = base + ext
+                    break
+
+    if not os.path.exists(file_path):
+        raise Exception("File not found on server.")
+    return file_path
+
+def download_video(request):
+    video_url = request.GET.get('url')
+    
+    if not video_url:
+        return redirect('homepage')
+
+    # 1. COPY COOKIES TO TEMP (Crucial Fix)
+    writable_cookie_path = prepare_cookie_file()
+
+    # 2. CONFIGURE YT-DLP
+    ydl_opts = download_options(tempfile.gettempdir(), writable_cookie_path)
+
     try:
-        file_path = None
-        with YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(video_url, download=True)
-            file_path = ydl.prepare_filename(info_dict)
-            
-            # Sanity check for filename changes
-            if not os.path.exists(file_path):
-                base, _ = os.path.splitext(file_path)
-                for ext in ['.mp4', '.mkv', '.webm']:
-                    if os.path.exists(base + ext):
-                        file_path = base + ext
-                        break
-
-        # 4. STREAM
-        if file_path and os.path.exists(file_path):
-            filename = os.path.basename(file_path)
-            # Pass both file_path AND writable_cookie_path to cleanup function
-            response = StreamingHttpResponse(
-                stream_and_delete(file_path, writable_cookie_path), 
-                content_type='application/octet-stream'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
-        else:
-            raise Exception("File not found on server.")
+        file_path = fetch_video_file(video_url, ydl_opts)
+
+        # 3. STREAM
+        filename = os.path.basename(file_path)
+        # Pass both file_path AND writable_cookie_path to cleanup function
+        response = StreamingHttpResponse(
+            stream_and_delete(file_path, writable_cookie_path), 
+            content_type='application/octet-stream'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
     except Exception as e:
         # Cleanup cookies if download fails before streaming starts
@@ -139,4 +203,204 @@ def download_video(request):
         return render(request, 'master/results.html', {
             'error': f"Download Failed: {str(e)}",
             'query': request.GET.get('query', '')
-        })
\ No newline at end of file
+        })
+
+VIDEO_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+class ZipStreamBuffer:
+    """
+    Write-only file object handed to zipfile. It has no seek(), so zipfile
+    switches to data descriptors and writes every entry front to back,
+    which lets us pass the archive bytes to the client as they are produced.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def resolve_batch_urls(request):
+    """
+    Builds the list of watch URLs from ?ids=a,b,c (or repeated ?id=) or
+    from a ?playlist= URL, capped at BATCH_DOWNLOAD_MAX_VIDEOS.
+    """
+    limit = settings.BATCH_DOWNLOAD_MAX_VIDEOS
+    playlist_url = request.GET.get('playlist')
+
+    if playlist_url:
+        ydl_opts = {
+            'quiet': True,
+            'extract_flat': True,
+            'skip_download': True,
+            'playlistend': limit,
+        }
+        from yt_dlp import YoutubeDL
+
+        with YoutubeDL(ydl_opts) as ydl:
+            playlist = ydl.extract_info(playlist_url, download=False)
+        video_ids = [entry.get('id') for entry in playlist.get('entries') or [] if entry]
+    else:
+        video_ids = request.GET.getlist('id')
+        for value in request.GET.getlist('ids'):
+            video_ids.extend(value.split(','))
+
+    urls = []
+    for video_id in video_ids:
+        video_id = (video_id or '').strip()
+        if not VIDEO_ID_PATTERN.match(video_id):
+            continue
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        if url not in urls:
+            urls.append(url)
+    return urls[:limit]
+
+def fetch_batch_item(video_url, output_dir):
+    """
+    Worker body for the batch pool. Every download gets its own folder and
+    its own cookie copy, because yt-dlp rewrites the cookie jar on exit.
+    """
+    cookie_path = prepare_cookie_file()
+    try:
+        return fetch_video_file(video_url, download_options(output_dir, cookie_path))
+    finally:
+        if cookie_path and os.path.exists(cookie_path):
+            os.remove(cookie_path)
+
+def unique_archive_name(filename, used_names):
+    base, ext = os.path.splitext(filename)
+    name = filename
+    counter = 1
+    while name in used_names:
+        name = f"{base}_{counter}{ext}"
+        counter += 1
+    used_names.add(name)
+    return name
+
+def finish_batch(executor, work_dir):
+    # Waits for any download still running (e.g. the client disconnected)
+    # before wiping the work folder, so nothing is left behind in /tmp.
+    executor.shutdown(wait=True)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+class BatchDownloadFailed(Exception):
+    pass
+
+def stream_zip_of_videos(video_urls, max_workers):
+    """
+    Generator that downloads the videos with a bounded thread pool and
+    streams a ZIP archive, adding each file as soon as its download is done.
+    Only `max_workers` downloads are queued at a time, so disk usage stays
+    bounded too, and the archive itself never touches the disk.
+
+    Raises BatchDownloadFailed before yielding anything if no video could
+    be downloaded, so the caller can still answer with an error page.
+    """
+    work_dir = tempfile.mkdtemp(prefix='batch_')
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    buffer = ZipStreamBuffer()
+    pending = iter(enumerate(video_urls))
+    in_flight = {}
+    used_names = set()
+    errors = []
+
+    def submit_next():
+        for index, url in pending:
+            output_dir = os.path.join(work_dir, str(index))
+            in_flight[executor.submit(fetch_batch_item, url, output_dir)] = url
+            return
+
+    try:
+        with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+            for _ in range(max_workers):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    submit_next()
+
+                    try:
+                        file_path = future.result()
+                    except Exception as e:
+                        print(f"Batch download error for {url}: {e}")
+                        errors.append(f"{url}: {e}")
+                        continue
+
+                    name = unique_archive_name(os.path.basename(file_path), used_names)
+                    with open(file_path, 'rb') as source, \
+                            archive.open(name, mode='w', force_zip64=True) as target:
+                        while True:
+                            chunk = source.read(8192)
+                            if not chunk:
+                                break
+                            target.write(chunk)
+                            data = buffer.drain()
+                            if data:
+                                yield data
+                    os.remove(file_path)
+
+            if not used_names:
+                raise BatchDownloadFailed("\n".join(errors))
+
+            if errors:
+                archive.writestr('errors.txt', "\n".join(errors))
+
+        yield buffer.drain()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        threading.Thread(target=finish_batch, args=(executor, work_dir), daemon=True).start()
+
+def download_batch(request):
+    """
+    Streams several videos as one ZIP. The response only starts once the
+    first video has been downloaded, and a whole batch takes minutes, so
+    gunicorn must run with a long enough --timeout (see gunicorn.conf.py).
+    """
+    try:
+        video_urls = resolve_batch_urls(request)
+    except Exception as e:
+        return render(request, 'master/results.html', {
+            'error': f"Playlist Failed: {str(e)}",
+            'query': request.GET.get('query', '')
+        }, status=502)
+
+    if not video_urls:
+        return render(request, 'master/results.html', {
+            'error': "No valid videos to download.",
+            'query': request.GET.get('query', '')
+        }, status=400)
+
+    max_workers = min(settings.BATCH_DOWNLOAD_MAX_WORKERS, len(video_urls))
+    stream = stream_zip_of_videos(video_urls, max_workers)
+
+    # Run the generator up to its first chunk, i.e. until one video is ready,
+    # so a batch where every download fails gets an error page instead of a ZIP
+    try:
+        first_chunk = next(stream)
+    except BatchDownloadFailed as e:
+        return render(request, 'master/results.html', {
+            'error': f"Download Failed: {str(e)}",
+            'query': request.GET.get('query', '')
+        }, status=502)
+
+    response = StreamingHttpResponse(
+        itertools.chain([first_chunk], stream),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = 'attachment; filename="videos.zip"'
+    return response
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import PuzzleLevel
+from youtube_search_download.db_routers import pinned_to_primary, reading_from_replica
+from .models import PlayerProfile, PuzzleLevel
 
 @admin.register(PuzzleLevel)
 class PuzzleLevelAdmin(admin.ModelAdmin):
@@ -13,6 +14,45 @@ class PuzzleLevelAdmin(admin.ModelAdmin):
     # Keeps everything neatly sorted by level number
     ordering = ('level_number',)
 
+    # Session flag: read the next list page from the primary (see changelist_view)
+    READ_PRIMARY_KEY = 'rebux_admin_read_primary'
+
+    # The list page is read-only, so it can come from a replica. The edit and
+    # delete pages stay on the primary, and so does the first list page after
+    # a change (the admin redirects there right after saving), so an edit is
+    # never followed by a stale read.
+    def changelist_view(self, request, extra_context=None):
+        if request.session.pop(self.READ_PRIMARY_KEY, False):
+            routing = pinned_to_primary()
+        else:
+            routing = reading_from_replica()
+        with routing:
+            response = super().changelist_view(request, extra_context)
+            # Render now, while still routed, since the rows are fetched by the template
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        with pinned_to_primary():
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        with pinned_to_primary():
+            return super().delete_view(request, object_id, extra_context)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        request.session[self.READ_PRIMARY_KEY] = True
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        request.session[self.READ_PRIMARY_KEY] = True
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        request.session[self.READ_PRIMARY_KEY] = True
+
     # 🪄 The Magic: Render the Unsplash URLs as actual images in the dashboard
     def image_1_preview(self, obj):
         if obj.image_1_url:
@@ -24,4 +64,11 @@ class PuzzleLevelAdmin(admin.ModelAdmin):
         if obj.image_2_url:
             return format_html('<img src="{}" style="height: 60px; border-radius: 4px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" />', obj.image_2_url)
         return "No Image"
-    image_2_preview.short_description = 'Clue 2'
\ No newline at end of file
+    image_2_preview.short_description = 'Clue 2'
+
+@admin.register(PlayerProfile)
+class PlayerProfileAdmin(admin.ModelAdmin):
+    # Scores are copied here from the Redis leaderboard by the flush_leaderboard task
+    list_display = ('user', 'current_level', 'score')
+    search_fields = ('user__username',)
+    ordering = ('-score',)
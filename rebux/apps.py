@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class RebuxConfig(AppConfig):
     name = 'rebux'
+
+    def ready(self):
+        from . import signals  # noqa: F401
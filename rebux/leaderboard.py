@@ -0,0 +1,235 @@
+"""
+Global Rebux ranking, kept in a Redis sorted set.
+
+Every correct guess does a single ZADD (O(log n)), so the ranking stays cheap
+no matter how many players are guessing. Registered users are also marked
+"dirty" and a periodic Celery task copies their scores into PlayerProfile in
+batches, instead of writing to the database on every guess.
+
+Scores and levels only ever go up (ZADD GT, and the flush keeps the higher of
+the stored and new values), so a user playing from a fresh session can never
+pull their ranking down. Anonymous players are forgotten once they have been
+idle for LEADERBOARD_ANONYMOUS_TTL seconds (see prune_anonymous).
+"""
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .models import PlayerProfile
+
+SCORES_KEY = 'rebux:leaderboard:scores'
+LEVELS_KEY = 'rebux:leaderboard:levels'  # sorted set too, so it can use GT
+NAMES_KEY = 'rebux:leaderboard:names'
+DIRTY_KEY = 'rebux:leaderboard:dirty'
+# Anonymous members scored by the time they last scored, for pruning
+SEEN_KEY = 'rebux:leaderboard:anonymous-seen'
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.LEADERBOARD_REDIS_URL,
+            decode_responses=True,
+            socket_timeout=settings.LEADERBOARD_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.LEADERBOARD_REDIS_TIMEOUT,
+        )
+    return _client
+
+def player_id(request):
+    """
+    Users rank under their account. Anonymous players get a random id stored
+    in their session (never the session key itself, which is a credential).
+    """
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    if 'player_id' not in request.session:
+        request.session['player_id'] = uuid.uuid4().hex
+    return f"player:{request.session['player_id']}"
+
+def current_player_id(request):
+    """
+    Like player_id(), but never creates an id (or a session) for an
+    anonymous visitor who hasn't scored yet. Returns None in that case.
+    """
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    anonymous_id = request.session.get('player_id')
+    return f"player:{anonymous_id}" if anonymous_id else None
+
+def saved_progress(user):
+    """
+    Returns (level, score) a user had reached, from PlayerProfile or, when the
+    latest guesses haven't been flushed yet, from Redis. Used to seed a new session.
+    """
+    profile = PlayerProfile.objects.filter(user=user).first()
+    level = profile.current_level if profile else 1
+    score = profile.score if profile else 0
+
+    try:
+        member = f"user:{user.pk}"
+        pipe = get_client().pipeline(transaction=False)
+        pipe.zscore(SCORES_KEY, member)
+        pipe.zscore(LEVELS_KEY, member)
+        redis_score, redis_level = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Leaderboard read failed for {user.pk}: {e}")
+    else:
+        score = max(score, int(redis_score or 0))
+        level = max(level, int(redis_level or 1))
+
+    return level, score
+
+def player_name(request):
+    if request.user.is_authenticated:
+        return request.user.get_username()
+    return f"Player {request.session['player_id'][:6]}"
+
+def record_score(member, name, score, level):
+    """
+    Stores the player's latest score and level. Failures are only logged,
+    a Redis hiccup must never break the game itself.
+    """
+    try:
+        pipe = get_client().pipeline(transaction=False)
+        pipe.zadd(SCORES_KEY, {member: score}, gt=True)
+        pipe.zadd(LEVELS_KEY, {member: level}, gt=True)
+        pipe.hset(NAMES_KEY, member, name)
+        if member.startswith('user:'):
+            pipe.sadd(DIRTY_KEY, member)
+        else:
+            pipe.zadd(SEEN_KEY, {member: time.time()})
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Leaderboard update failed for {member}: {e}")
+
+def _entries(rows, first_rank):
+    """Turns ZREVRANGE rows into dicts with rank, name, level and score."""
+    if not rows:
+        return []
+    members = [member for member, _ in rows]
+    pipe = get_client().pipeline(transaction=False)
+    pipe.hmget(NAMES_KEY, members)
+    pipe.zmscore(LEVELS_KEY, members)
+    names, levels = pipe.execute()
+
+    return [
+        {
+            'rank': first_rank + offset,
+            'name': names[offset] or 'Anonymous',
+            'level': int(levels[offset] or 1),
+            'score': int(score),
+        }
+        for offset, (_, score) in enumerate(rows)
+    ]
+
+def top(limit=10):
+    rows = get_client().zrevrange(SCORES_KEY, 0, limit - 1, withscores=True)
+    return _entries(rows, 1)
+
+def around(member, radius=3):
+    """
+    Returns (entry for `member`, neighbours above and below it), or
+    (None, []) if the player hasn't scored yet.
+    """
+    client = get_client()
+    # The ranking can change between the two calls (other players scoring,
+    # prune_anonymous), so look for `member` in the rows instead of trusting
+    # the earlier rank, and try again if it has moved out of the window
+    for _ in range(3):
+        rank = client.zrevrank(SCORES_KEY, member)
+        if rank is None:
+            return None, []
+
+        start = max(rank - radius, 0)
+        rows = client.zrevrange(SCORES_KEY, start, rank + radius, withscores=True)
+        members = [row_member for row_member, _ in rows]
+        if member in members:
+            entries = _entries(rows, start + 1)
+            return entries[members.index(member)], entries
+
+    return None, []
+
+def flush_to_profiles(batch_size=500):
+    """
+    Copies dirty user scores from Redis into PlayerProfile, one upsert per
+    batch. Returns the number of profiles written.
+    """
+    client = get_client()
+    written = 0
+
+    while True:
+        members = client.spop(DIRTY_KEY, batch_size)
+        if not members:
+            break
+
+        pipe = client.pipeline(transaction=False)
+        pipe.zmscore(SCORES_KEY, members)
+        pipe.zmscore(LEVELS_KEY, members)
+        scores, levels = pipe.execute()
+
+        user_ids = [int(member.split(':', 1)[1]) for member in members]
+        # Accounts deleted since their last guess are simply dropped
+        existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        # Never lower what is already stored
+        stored = {
+            user_id: (score, level)
+            for user_id, score, level in PlayerProfile.objects.filter(user_id__in=user_ids)
+            .values_list('user_id', 'score', 'current_level')
+        }
+
+        profiles = []
+        for user_id, score, level in zip(user_ids, scores, levels):
+            if user_id not in existing:
+                continue
+            stored_score, stored_level = stored.get(user_id, (0, 1))
+            profiles.append(PlayerProfile(
+                user_id=user_id,
+                score=max(int(score or 0), stored_score),
+                current_level=max(int(level or 1), stored_level),
+            ))
+
+        try:
+            PlayerProfile.objects.bulk_create(
+                profiles,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['score', 'current_level'],
+            )
+        except Exception:
+            # Put them back so the next flush retries this batch
+            client.sadd(DIRTY_KEY, *members)
+            raise
+
+        written += len(profiles)
+
+    return written
+
+def prune_anonymous(max_idle, batch_size=500):
+    """
+    Removes anonymous players who haven't scored for `max_idle` seconds (by
+    then their session has expired, so nobody can play as them again).
+    Returns the number of players removed.
+    """
+    client = get_client()
+    cutoff = time.time() - max_idle
+    removed = 0
+
+    while True:
+        members = client.zrangebyscore(SEEN_KEY, '-inf', cutoff, start=0, num=batch_size)
+        if not members:
+            break
+
+        pipe = client.pipeline(transaction=False)
+        pipe.zrem(SCORES_KEY, *members)
+        pipe.zrem(LEVELS_KEY, *members)
+        pipe.hdel(NAMES_KEY, *members)
+        pipe.zrem(SEEN_KEY, *members)
+        pipe.execute()
+        removed += len(members)
+
+    return removed
@@ -0,0 +1,43 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from rebux.models import PuzzleLevel
+
+LEVEL_FIELDS = (
+    'level_number',
+    'image_1_url',
+    'image_2_url',
+    'image_3_url',
+    'image_4_url',
+    'correct_answer',
+    'category',
+    'hint',
+)
+
+class Command(BaseCommand):
+    help = "Streams every PuzzleLevel to a JSONL file (one level per line) using constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for stdout (default).")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched from the database per round trip.")
+
+    def handle(self, *args, **options):
+        rows = (
+            PuzzleLevel.objects.order_by('level_number')
+            .values(*LEVEL_FIELDS)
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+        output = sys.stdout if options['path'] == '-' else open(options['path'], 'w', encoding='utf-8')
+        count = 0
+        try:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        self.stderr.write(f"Exported {count} levels.")
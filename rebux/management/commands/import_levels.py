@@ -0,0 +1,202 @@
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rebux.management.commands.export_levels import LEVEL_FIELDS
+from rebux.models import PuzzleLevel
+from rebux.puzzle_cache import invalidate_levels
+from youtube_search_download.db_routers import pinned_to_primary
+
+REQUIRED_FIELDS = ('image_1_url', 'image_2_url', 'correct_answer')
+
+def normalize_answer(answer):
+    # Same normalisation as PuzzleLevel.check_answer, so 'Bill Gates' == 'billgates'
+    return answer.lower().replace(" ", "")
+
+def field_errors(row):
+    """
+    Type checks and the model's field validators (URLs, max_length), which
+    bulk_create would not run for us: SQLite happily stores a list, a 500
+    character answer or "not a url". Returns a list of problems.
+    """
+    errors = []
+    for name in LEVEL_FIELDS:
+        value = row.get(name)
+        if value is None:
+            continue
+        if name == 'level_number':
+            # int() in save_chunk accepts "12" too, but not true/12.5/[12]
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                errors.append(f"{name} is not an integer")
+            continue
+        if not isinstance(value, str):
+            errors.append(f"{name} is not a string")
+            continue
+        try:
+            PuzzleLevel._meta.get_field(name).run_validators(value)
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+    return errors
+
+class Command(BaseCommand):
+    help = (
+        "Imports PuzzleLevels from a JSONL file (as written by export_levels) in chunks with bulk_create. "
+        "Levels whose answer already exists under another level number are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Input file, or '-' for stdin (default).")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows inserted per bulk_create.")
+        parser.add_argument(
+            '--on-conflict',
+            choices=('skip', 'update', 'append'),
+            default='skip',
+            help=(
+                "What to do when a level_number already exists: 'skip' keeps the existing level, "
+                "'update' overwrites it, 'append' ignores the file's numbers and adds every level after the current last one."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        mode = options['on_conflict']
+        self.stats = {'created': 0, 'updated': 0, 'skipped': 0, 'duplicates': 0, 'invalid': 0, 'conflicts': 0}
+
+        # Read the current state from the primary, since we are about to write to it
+        with pinned_to_primary():
+            self.answer_by_level = {
+                level_number: normalize_answer(answer)
+                for level_number, answer in PuzzleLevel.objects.values_list('level_number', 'correct_answer').iterator()
+            }
+        self.level_by_answer = {answer: level for level, answer in self.answer_by_level.items()}
+        self.next_level = max(self.answer_by_level, default=0) + 1
+
+        source = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            rows = self.read_rows(source)
+            while True:
+                chunk = list(islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                self.save_chunk(chunk, mode)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        elapsed = time.perf_counter() - started
+        summary = ", ".join(f"{count} {name}" for name, count in self.stats.items())
+        self.stdout.write(self.style.SUCCESS(f"Imported levels in {elapsed:.2f}s: {summary}."))
+
+    def read_rows(self, source):
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                self.reject(line_number, f"invalid JSON ({e})")
+                continue
+            if not isinstance(row, dict):
+                self.reject(line_number, "not a JSON object")
+                continue
+            missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+            if missing:
+                self.reject(line_number, f"missing {', '.join(missing)}")
+                continue
+            errors = field_errors(row)
+            if errors:
+                self.reject(line_number, "; ".join(errors))
+                continue
+            yield line_number, row
+
+    def reject(self, line_number, reason):
+        self.stats['invalid'] += 1
+        self.stderr.write(f"Line {line_number}: {reason}, skipped.")
+
+    def save_chunk(self, chunk, mode):
+        # level_number -> PuzzleLevel; a number repeated in the chunk keeps its last row,
+        # since an upsert can't touch the same row twice in one statement
+        levels = {}
+        updated = set()
+
+        for line_number, row in chunk:
+            answer = normalize_answer(row['correct_answer'])
+            owner = self.level_by_answer.get(answer)
+
+            if mode == 'append':
+                if owner is not None:
+                    self.stats['duplicates'] += 1
+                    continue
+                level_number = self.next_level
+            else:
+                try:
+                    level_number = int(row['level_number'])
+                except (KeyError, TypeError, ValueError):
+                    self.reject(line_number, "missing or invalid level_number")
+                    continue
+                if owner is not None and owner != level_number:
+                    self.stats['duplicates'] += 1
+                    continue
+                if level_number in self.answer_by_level:
+                    if mode == 'skip':
+                        self.stats['skipped'] += 1
+                        continue
+                    # The level being overwritten frees up its old answer
+                    self.level_by_answer.pop(self.answer_by_level[level_number], None)
+                    if level_number not in levels:
+                        updated.add(level_number)
+
+            self.answer_by_level[level_number] = answer
+            self.level_by_answer[answer] = level_number
+            self.next_level = max(self.next_level, level_number + 1)
+
+            fields = {field: row[field] for field in LEVEL_FIELDS if row.get(field) is not None}
+            fields['level_number'] = level_number
+            levels[level_number] = PuzzleLevel(**fields)
+
+        if not levels:
+            return
+
+        with transaction.atomic():
+            if mode == 'update':
+                PuzzleLevel.objects.bulk_create(
+                    list(levels.values()),
+                    update_conflicts=True,
+                    unique_fields=['level_number'],
+                    update_fields=[field for field in LEVEL_FIELDS if field != 'level_number'],
+                )
+            else:
+                # Conflicts were filtered above; this only guards against a level
+                # generated by Celery while the import is running
+                PuzzleLevel.objects.bulk_create(list(levels.values()), ignore_conflicts=True)
+
+        # bulk_create skips the post_save signal, so clear the cached levels here
+        invalidate_levels(levels)
+
+        conflicts = set()
+        if mode != 'update':
+            # ignore_conflicts drops rows silently: a number that now holds a
+            # different answer was taken by someone else mid-import
+            with pinned_to_primary():
+                saved = dict(
+                    PuzzleLevel.objects.filter(level_number__in=levels).values_list('level_number', 'correct_answer')
+                )
+            for level_number, puzzle in levels.items():
+                if saved.get(level_number) != puzzle.correct_answer:
+                    conflicts.add(level_number)
+                    self.stderr.write(f"Level {level_number} was created by someone else during the import, not imported.")
+                    # Track the level that is really there
+                    self.level_by_answer.pop(self.answer_by_level[level_number], None)
+                    if level_number in saved:
+                        answer = normalize_answer(saved[level_number])
+                        self.answer_by_level[level_number] = answer
+                        self.level_by_answer[answer] = level_number
+
+        self.stats['conflicts'] += len(conflicts)
+        self.stats['updated'] += len(updated)
+        self.stats['created'] += len(levels) - len(updated) - len(conflicts)
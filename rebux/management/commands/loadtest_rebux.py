@@ -0,0 +1,348 @@
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from unittest import mock
+
+import requests
+from django.contrib.sessions.models import Session
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from rebux.models import PuzzleLevel
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+class Stats:
+    """Thread-safe collector for latencies, query counts and errors."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.correct = 0
+        self.wrong = 0
+        self.finished_players = 0
+
+    def add_latency(self, name, seconds):
+        with self.lock:
+            self.latencies[name].append(seconds)
+
+    def add_queries(self, path, count):
+        with self.lock:
+            self.queries[path].append(count)
+
+    def add_error(self, name):
+        with self.lock:
+            self.errors[name] += 1
+
+    def add_guess(self, correct):
+        with self.lock:
+            if correct:
+                self.correct += 1
+            else:
+                self.wrong += 1
+
+class GenerationStub:
+    """
+    Stands in for rebux.tasks.generate_new_levels. Every .delay() is counted;
+    one made while an earlier generation is still "running" is a duplicate,
+    which is exactly the work a real deployment would pay Gemini for twice.
+    """
+    def __init__(self, answers, latency):
+        self.answers = answers
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.duplicates = 0
+        self.threads = []
+
+    def delay(self, num_levels=5):
+        with self.lock:
+            self.calls += 1
+            if self.in_flight:
+                self.duplicates += 1
+            self.in_flight += 1
+        thread = threading.Thread(target=self.generate, args=(num_levels,), daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def generate(self, num_levels):
+        time.sleep(self.latency)
+        try:
+            for _ in range(num_levels):
+                with self.lock:
+                    level_number = max(self.answers) + 1
+                    answer = f"stub answer {level_number}"
+                    self.answers[level_number] = answer
+                PuzzleLevel.objects.create(
+                    level_number=level_number,
+                    image_1_url=f"https://example.com/{level_number}/1.jpg",
+                    image_2_url=f"https://example.com/{level_number}/2.jpg",
+                    correct_answer=answer,
+                )
+        finally:
+            connections.close_all()
+            with self.lock:
+                self.in_flight -= 1
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the Rebux game loop: starts a local server on a throwaway test database, "
+        "simulates players solving levels and reports latency, queries per request, "
+        "session-table growth and duplicate level generation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=50, help="Concurrent simulated players.")
+        parser.add_argument('--duration', type=float, default=30, help="Test length in seconds.")
+        parser.add_argument('--rate', type=float, default=1.0, help="Guesses per second per player (Poisson).")
+        parser.add_argument('--accuracy', type=float, default=0.5, help="Probability that a guess is correct.")
+        parser.add_argument('--levels', type=int, default=100, help="Levels seeded before the test starts.")
+        parser.add_argument('--generation-latency', type=float, default=5.0, help="Seconds the stubbed generate_new_levels takes.")
+        parser.add_argument('--mode', choices=('form', 'json'), default='form', help="Guess through the HTML form or the JSON endpoint.")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for reproducible runs.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+
+        with tempfile.TemporaryDirectory() as tmp, ExitStack() as stack:
+            # A file-backed SQLite test DB, so the server threads share it
+            # (the default in-memory one is per connection)
+            for alias in connections:
+                settings_dict = connections[alias].settings_dict
+                if settings_dict['ENGINE'].endswith('sqlite3') and not settings_dict['TEST'].get('MIRROR'):
+                    settings_dict['TEST']['NAME'] = f"{tmp}/{alias}.sqlite3"
+
+            stack.enter_context(override_settings(
+                ALLOWED_HOSTS=['127.0.0.1'],
+                SESSION_COOKIE_SECURE=False,
+                CSRF_COOKIE_SECURE=False,
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'loadtest'}},
+            ))
+            # Redis and Celery are out of scope here: the leaderboard becomes a no-op
+            # and generation is replaced by GenerationStub
+            stack.enter_context(mock.patch('rebux.leaderboard.record_score'))
+
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                report = self.run_test(stack)
+            finally:
+                connections.close_all()
+                teardown_databases(old_config, verbosity=0)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def run_test(self, stack):
+        options = self.options
+
+        answers = {number: f"answer {number}" for number in range(1, options['levels'] + 1)}
+        PuzzleLevel.objects.bulk_create(
+            PuzzleLevel(
+                level_number=number,
+                image_1_url=f"https://example.com/{number}/1.jpg",
+                image_2_url=f"https://example.com/{number}/2.jpg",
+                correct_answer=answer,
+            )
+            for number, answer in answers.items()
+        )
+        generator = GenerationStub(answers, options['generation_latency'])
+        stack.enter_context(mock.patch('rebux.views.generate_new_levels', generator))
+
+        stats = Stats()
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+        server.set_app(self.counting_app(WSGIHandler(), stats))
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        sessions_before = Session.objects.count()
+        deadline = time.monotonic() + options['duration']
+        players = [
+            threading.Thread(target=self.play, args=(base_url, answers, stats, deadline), daemon=True)
+            for _ in range(options['players'])
+        ]
+        started = time.monotonic()
+        for player in players:
+            player.start()
+        for player in players:
+            player.join()
+        elapsed = time.monotonic() - started
+
+        server.shutdown()
+        server.server_close()
+        for thread in generator.threads:
+            thread.join()
+
+        requests_made = sum(len(values) for values in stats.latencies.values())
+        return {
+            'players': options['players'],
+            'mode': options['mode'],
+            'duration_seconds': round(elapsed, 2),
+            'requests': requests_made,
+            'requests_per_second': round(requests_made / elapsed, 1) if elapsed else 0,
+            'guesses': {'correct': stats.correct, 'wrong': stats.wrong},
+            'players_reached_end': stats.finished_players,
+            'errors': dict(stats.errors),
+            'latency_ms': {
+                name: {
+                    'count': len(values),
+                    'p50': round(percentile(values, 50) * 1000, 1),
+                    'p99': round(percentile(values, 99) * 1000, 1),
+                    'max': round(max(values) * 1000, 1),
+                }
+                for name, values in sorted(stats.latencies.items())
+            },
+            'queries_per_request': {
+                path: {
+                    'mean': round(sum(values) / len(values), 1),
+                    'max': max(values),
+                }
+                for path, values in sorted(stats.queries.items())
+            },
+            'sessions': {'before': sessions_before, 'after': Session.objects.count()},
+            'levels': {'seeded': options['levels'], 'after': PuzzleLevel.objects.count()},
+            'generation': {'calls': generator.calls, 'duplicates': generator.duplicates},
+        }
+
+    def counting_app(self, application, stats):
+        """Wraps the WSGI app to count the SQL queries each request runs."""
+        def app(environ, start_response):
+            count = [0]
+
+            def counter(execute, sql, params, many, context):
+                count[0] += 1
+                return execute(sql, params, many, context)
+
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = application(environ, start_response)
+            stats.add_queries(f"{environ['REQUEST_METHOD']} {environ['PATH_INFO']}", count[0])
+            return response
+        return app
+
+    def timed(self, stats, name, call):
+        start = time.perf_counter()
+        try:
+            response = call()
+        except requests.RequestException:
+            stats.add_error(f"{name}: connection")
+            return None
+        stats.add_latency(name, time.perf_counter() - start)
+        if response.status_code >= 400:
+            stats.add_error(f"{name}: HTTP {response.status_code}")
+            return None
+        return response
+
+    def play(self, base_url, answers, stats, deadline):
+        options = self.options
+        client = requests.Session()
+        level = 1
+        out_of_levels = False
+        counted_end = False
+
+        # The first visit creates the session and sets the CSRF cookie
+        response = self.timed(stats, 'GET play', lambda: client.get(f"{base_url}/", timeout=30))
+        if response is not None:
+            out_of_levels = response.url.endswith('/win/')
+
+        while time.monotonic() < deadline:
+            time.sleep(self.random.expovariate(options['rate']))
+            if time.monotonic() >= deadline:
+                break
+
+            if out_of_levels:
+                # Come back and check for new levels, like the button on the win page
+                if not counted_end:
+                    counted_end = True
+                    with stats.lock:
+                        stats.finished_players += 1
+                response = self.timed(stats, 'GET play', lambda: client.get(f"{base_url}/", timeout=30))
+                if response is not None:
+                    out_of_levels = response.url.endswith('/win/')
+                continue
+
+            correct = self.random.random() < options['accuracy']
+            guess = answers.get(level, '') if correct else 'definitely wrong'
+            csrf_token = client.cookies.get('csrftoken', '')
+
+            if options['mode'] == 'json':
+                response = self.timed(stats, 'POST game (json)', lambda: client.post(
+                    f"{base_url}/game/",
+                    json={'guess': guess},
+                    headers={'X-CSRFToken': csrf_token},
+                    timeout=30,
+                ))
+                if response is None:
+                    continue
+                state = response.json()
+                out_of_levels = state['finished']
+                if not out_of_levels:
+                    level = state['level']
+            else:
+                # The form flow is a POST plus the redirected GET, timed together
+                response = self.timed(stats, 'POST play (form + redirect)', lambda: client.post(
+                    f"{base_url}/",
+                    data={'guess': guess, 'csrfmiddlewaretoken': csrf_token},
+                    timeout=30,
+                ))
+                if response is None:
+                    continue
+                out_of_levels = response.url.endswith('/win/')
+                match = re.search(r'Level (\d+)</p>', response.text)
+                if match:
+                    level = int(match.group(1))
+
+            stats.add_guess(correct)
+
+    def print_report(self, report):
+        write = self.stdout.write
+        write(self.style.MIGRATE_HEADING(
+            f"Rebux load test: {report['players']} players, {report['mode']} mode, {report['duration_seconds']}s"
+        ))
+        write(f"  requests: {report['requests']} ({report['requests_per_second']}/s)")
+        write(f"  guesses: {report['guesses']['correct']} correct, {report['guesses']['wrong']} wrong; "
+              f"{report['players_reached_end']} players ran out of levels")
+
+        write(self.style.MIGRATE_HEADING("Latency"))
+        for name, values in report['latency_ms'].items():
+            write(f"  {name:<30} n={values['count']:<6} p50 {values['p50']:7.1f} ms   "
+                  f"p99 {values['p99']:7.1f} ms   max {values['max']:7.1f} ms")
+
+        write(self.style.MIGRATE_HEADING("Queries per request"))
+        for path, values in report['queries_per_request'].items():
+            write(f"  {path:<30} mean {values['mean']:5.1f}   max {values['max']}")
+
+        write(self.style.MIGRATE_HEADING("Database"))
+        write(f"  sessions: {report['sessions']['before']} -> {report['sessions']['after']}")
+        write(f"  levels: {report['levels']['seeded']} seeded -> {report['levels']['after']}")
+        write(f"  generation: {report['generation']['calls']} calls, "
+              f"{report['generation']['duplicates']} while another was still running")
+
+        if report['errors']:
+            write(self.style.ERROR("Errors"))
+            for name, count in report['errors'].items():
+                write(f"  {name}: {count}")
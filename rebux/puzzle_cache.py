@@ -0,0 +1,61 @@
+"""
+Caching for the parts of the game that are the same for every player.
+
+The current and next PuzzleLevel are cached per level number, and play.html
+caches the puzzle markup ('rebux_puzzle') and the next-level prefetch links
+('rebux_prefetch') per level with {% cache %}. Only the per-session bits
+(level/score header, hint, message, CSRF form) are rendered on each request.
+
+Level N's entry also depends on level N+1 (for prefetching), so changing a
+level invalidates the level before it too. Invalidation only works across
+processes with a shared cache (Redis), so PUZZLE_CACHE_SECONDS is 0, and
+nothing is cached, without one. Cached levels are read from the primary, so
+replica lag can't put an edited level's old version back in the cache (the
+fragments are rendered from these same objects).
+"""
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from youtube_search_download.db_routers import pinned_to_primary
+
+from .models import PuzzleLevel
+
+FRAGMENTS = ('rebux_puzzle', 'rebux_prefetch')
+
+def puzzles_key(level_number):
+    return f'rebux:puzzles:{level_number}'
+
+def get_puzzles(level_number):
+    """
+    Returns (current puzzle, next puzzle) for a level; either may be None.
+    """
+    caching = settings.PUZZLE_CACHE_SECONDS > 0
+    key = puzzles_key(level_number)
+    puzzles = cache.get(key) if caching else None
+    if puzzles is not None:
+        return puzzles
+
+    # What gets cached must come from the primary: a lagging replica right
+    # after an edit would put the old row (answer included) back for hours
+    with pinned_to_primary() if caching else nullcontext():
+        by_number = {
+            puzzle.level_number: puzzle
+            for puzzle in PuzzleLevel.objects.filter(level_number__in=(level_number, level_number + 1))
+        }
+    puzzles = (by_number.get(level_number), by_number.get(level_number + 1))
+
+    # A missing level is not cached, so freshly generated levels show up straight away
+    if caching and puzzles[0] is not None:
+        cache.set(key, puzzles, settings.PUZZLE_CACHE_SECONDS)
+    return puzzles
+
+def invalidate_levels(level_numbers):
+    keys = []
+    for level_number in level_numbers:
+        for affected in (level_number, level_number - 1):
+            keys.append(puzzles_key(affected))
+            keys.extend(make_template_fragment_key(name, [affected]) for name in FRAGMENTS)
+    cache.delete_many(keys)
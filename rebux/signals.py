@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PuzzleLevel
+from .puzzle_cache import invalidate_levels
+
+@receiver(post_save, sender=PuzzleLevel)
+@receiver(post_delete, sender=PuzzleLevel)
+def clear_cached_level(sender, instance, **kwargs):
+    # Admin edits and newly generated levels must show up without waiting for the cache to expire
+    invalidate_levels([instance.level_number])
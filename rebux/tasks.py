@@ -1,25 +1,40 @@
 import random
 import time
-import requests
-from pydantic import BaseModel, Field
-from google import genai
+from functools import lru_cache
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from youtube_search_download.db_routers import pinned_to_primary
 from .models import PuzzleLevel
 
-# 1. Update Schema for Wikipedia
-class RebusPuzzle(BaseModel):
-    final_answer: str = Field(description="The compound word or famous phrase (e.g., 'Bill Gates')")
-    reasoning: str = Field(description="Explain why the two visual clues are unambiguous NOUNS, not adjectives.")
-    category: str = Field(description="A short, 1-2 word category for the UI")
-    hint: str = Field(description="A helpful textual hint for the player")
-    search_term_1: str = Field(description="A specific Wikipedia article title (e.g., 'Apple', 'Taj Mahal').")
-    search_term_2: str = Field(description="A specific Wikipedia article title (e.g., 'Tree', 'George Washington').")
+# google.genai, pydantic and requests are imported inside the functions that
+# use them. This module is loaded by rebux.views, so top-level imports here
+# would slow down every web worker even though only Celery ever calls them.
 
-class PuzzleList(BaseModel):
-    puzzles: list[RebusPuzzle]
+@lru_cache(maxsize=None)
+def puzzle_schema():
+    """
+    Builds (once) the Gemini response schema and returns the PuzzleList model.
+    """
+    from pydantic import BaseModel, Field
+
+    # 1. Update Schema for Wikipedia
+    class RebusPuzzle(BaseModel):
+        final_answer: str = Field(description="The compound word or famous phrase (e.g., 'Bill Gates')")
+        reasoning: str = Field(description="Explain why the two visual clues are unambiguous NOUNS, not adjectives.")
+        category: str = Field(description="A short, 1-2 word category for the UI")
+        hint: str = Field(description="A helpful textual hint for the player")
+        search_term_1: str = Field(description="A specific Wikipedia article title (e.g., 'Apple', 'Taj Mahal').")
+        search_term_2: str = Field(description="A specific Wikipedia article title (e.g., 'Tree', 'George Washington').")
 
-@shared_task
+    class PuzzleList(BaseModel):
+        puzzles: list[RebusPuzzle]
+
+    return PuzzleList
+
+@shared_task(time_limit=180, soft_time_limit=150)
+@pinned_to_primary()  # reads recent answers, which may have just been written
 def generate_new_levels(num_levels=5):
     print(f"🧠 Asking Gemini to generate {num_levels} new ADVANCED puzzles...")
     
@@ -38,6 +53,8 @@ def generate_new_levels(num_levels=5):
     ]
     selected_theme = random.choice(themes)
     
+    from google import genai
+
     client = genai.Client(api_key=settings.GEMINI_API_KEY)
     
     # 2. Update Prompt for Wikipedia
@@ -56,44 +73,82 @@ def generate_new_levels(num_levels=5):
         contents=prompt,
         config={
             'response_mime_type': 'application/json',
-            'response_schema': PuzzleList,
+            'response_schema': puzzle_schema(),
             'temperature': 0.9 
         }
     )
     
     puzzle_data = response.parsed
     
+    # 3. Hand each puzzle to the 'images' queue so the slow, polite Wikipedia
+    # lookups don't keep this LLM worker busy
     for item in puzzle_data.puzzles:
-        print(f"\n🔍 Fetching Wikipedia images for: {item.final_answer}")
-        
-        # 3. THE FIX: Pass only ONE argument. No more ddg_client!
-        img1_url = fetch_image(item.search_term_1)
-        time.sleep(1) # A polite 1-second delay for Wikipedia's servers
-        
-        img2_url = fetch_image(item.search_term_2)
-        time.sleep(1)
-        
-        if img1_url and img2_url:
-            last_level = PuzzleLevel.objects.order_by('-level_number').first()
-            new_level_num = (last_level.level_number + 1) if last_level else 1
-            
-            PuzzleLevel.objects.create(
-                level_number=new_level_num,
-                image_1_url=img1_url, 
-                image_2_url=img2_url,
-                correct_answer=item.final_answer,
-                category=item.category,
-                hint=item.hint
-            )
-            print(f"✅ Successfully generated and saved level {new_level_num}!")
-        else:
-            print(f"❌ Failed to fetch images for {item.final_answer}. Skipping.")
+        resolve_level_images.delay(item.model_dump())
+
+@shared_task(time_limit=60, soft_time_limit=45)
+@pinned_to_primary()  # reads the last level number right before inserting the next one
+def resolve_level_images(puzzle):
+    """
+    Fetches both clue images for one generated puzzle and saves it as the next level.
+    """
+    print(f"\n🔍 Fetching Wikipedia images for: {puzzle['final_answer']}")
+    
+    # 3. THE FIX: Pass only ONE argument. No more ddg_client!
+    img1_url = fetch_image(puzzle['search_term_1'])
+    time.sleep(1) # A polite 1-second delay for Wikipedia's servers
+    
+    img2_url = fetch_image(puzzle['search_term_2'])
+    time.sleep(1)
+    
+    if not (img1_url and img2_url):
+        print(f"❌ Failed to fetch images for {puzzle['final_answer']}. Skipping.")
+        return
+
+    # Several image workers can finish at once, so retry if another one
+    # grabbed the same level number first
+    for _ in range(5):
+        last_level = PuzzleLevel.objects.order_by('-level_number').first()
+        new_level_num = (last_level.level_number + 1) if last_level else 1
+        try:
+            with transaction.atomic():
+                PuzzleLevel.objects.create(
+                    level_number=new_level_num,
+                    image_1_url=img1_url, 
+                    image_2_url=img2_url,
+                    correct_answer=puzzle['final_answer'],
+                    category=puzzle['category'],
+                    hint=puzzle['hint']
+                )
+        except IntegrityError:
+            continue
+        print(f"✅ Successfully generated and saved level {new_level_num}!")
+        return
+
+    print(f"❌ Could not find a free level number for {puzzle['final_answer']}.")
+
+@shared_task(time_limit=60, soft_time_limit=45)
+def flush_leaderboard():
+    """
+    Periodic (Celery beat) copy of the Redis leaderboard into PlayerProfile,
+    plus cleanup of anonymous players whose sessions have expired.
+    """
+    from .leaderboard import flush_to_profiles, prune_anonymous
+
+    written = flush_to_profiles(batch_size=settings.LEADERBOARD_FLUSH_BATCH_SIZE)
+    if written:
+        print(f"🏆 Flushed {written} leaderboard scores to PlayerProfile.")
+
+    removed = prune_anonymous(settings.LEADERBOARD_ANONYMOUS_TTL, batch_size=settings.LEADERBOARD_FLUSH_BATCH_SIZE)
+    if removed:
+        print(f"🧹 Pruned {removed} idle anonymous players from the leaderboard.")
 
 def fetch_image(query):
     """
     Fetches the main image for a Wikipedia article.
     Includes a User-Agent header to bypass Wikipedia's bot-blocker.
     """
+    import requests
+
     # 1. THE FIX: Create a polite caller ID for Wikipedia
     headers = {
         'User-Agent': 'RebuxGameBot/1.0 (Educational Rebus Game Backend)'
@@ -144,6 +199,9 @@ def fetch_image(query):
             if 'thumbnail' in page_data:
                 return page_data['thumbnail']['source']
                 
+    except SoftTimeLimitExceeded:
+        # Let the task's soft time limit stop it instead of moving on to the next image
+        raise
     except Exception as e:
         print(f"Wikipedia fetch error for '{query}': {e}")
         
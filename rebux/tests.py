@@ -1,3 +1,190 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connections, router
+from django.test import TestCase, override_settings
+
+from youtube_search_download import db_routers
+from youtube_search_download.db_routers import pinned_to_primary, reading_from_replica
+
+from .admin import PuzzleLevelAdmin
+from .puzzle_cache import get_puzzles
+from .models import PuzzleLevel
+
+def level(level_number, answer, **fields):
+    return {
+        'level_number': level_number,
+        'image_1_url': f"https://example.com/{level_number}/1.jpg",
+        'image_2_url': f"https://example.com/{level_number}/2.jpg",
+        'correct_answer': answer,
+        **fields,
+    }
+
+class ImportLevelsTests(TestCase):
+    def setUp(self):
+        PuzzleLevel.objects.create(**level(1, 'Bill Gates'))
+        PuzzleLevel.objects.create(**level(2, 'Eiffel Tower'))
+
+    def import_levels(self, lines, **options):
+        """Runs import_levels on a temporary JSONL file, returns (stdout, stderr)."""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            for line in lines:
+                f.write((line if isinstance(line, str) else json.dumps(line)) + "\n")
+        self.addCleanup(os.remove, f.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_levels', f.name, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def answers(self):
+        return dict(PuzzleLevel.objects.values_list('level_number', 'correct_answer'))
+
+    def test_skip_keeps_existing_levels(self):
+        out, _ = self.import_levels([level(2, 'Mona Lisa'), level(3, 'Big Ben')])
+
+        self.assertEqual(self.answers(), {1: 'Bill Gates', 2: 'Eiffel Tower', 3: 'Big Ben'})
+        self.assertIn("1 created, 0 updated, 1 skipped", out)
+
+    def test_update_overwrites_existing_levels(self):
+        out, _ = self.import_levels([level(2, 'Mona Lisa', hint="A painting")], on_conflict='update')
+
+        updated = PuzzleLevel.objects.get(level_number=2)
+        self.assertEqual((updated.correct_answer, updated.hint), ('Mona Lisa', "A painting"))
+        self.assertIn("0 created, 1 updated", out)
+
+    def test_append_renumbers_after_the_last_level(self):
+        out, _ = self.import_levels([level(1, 'Big Ben'), level(1, 'Mona Lisa')], on_conflict='append')
+
+        self.assertEqual(self.answers(), {1: 'Bill Gates', 2: 'Eiffel Tower', 3: 'Big Ben', 4: 'Mona Lisa'})
+        self.assertIn("2 created", out)
+
+    def test_duplicate_answers_in_file_are_skipped(self):
+        # Same answer after normalisation, under two new level numbers
+        out, _ = self.import_levels([level(3, 'Big Ben'), level(4, 'bigben'), level(5, 'BILL GATES')])
+
+        self.assertEqual(self.answers(), {1: 'Bill Gates', 2: 'Eiffel Tower', 3: 'Big Ben'})
+        self.assertIn("1 created, 0 updated, 0 skipped, 2 duplicates", out)
+
+    def test_update_frees_the_old_answer(self):
+        out, _ = self.import_levels(
+            [level(2, 'Mona Lisa'), level(3, 'Eiffel Tower')],
+            on_conflict='update',
+        )
+
+        self.assertEqual(self.answers(), {1: 'Bill Gates', 2: 'Mona Lisa', 3: 'Eiffel Tower'})
+        self.assertIn("1 created, 1 updated, 0 skipped, 0 duplicates", out)
+
+    def test_invalid_lines_are_rejected(self):
+        out, err = self.import_levels([
+            "not json",
+            "[1, 2]",
+            {'level_number': 3, 'correct_answer': 'Big Ben'},
+            level(4, ['Big', 'Ben']),
+            level(5, 'Big Ben', hint=12),
+            level(6, 'x' * 101),
+            level(True, 'Big Ben'),
+            level(8, 'Big Ben', image_1_url='not a url'),
+            level(9, 'Mona Lisa'),
+        ])
+
+        self.assertEqual(self.answers(), {1: 'Bill Gates', 2: 'Eiffel Tower', 9: 'Mona Lisa'})
+        self.assertIn("1 created, 0 updated, 0 skipped, 0 duplicates, 8 invalid", out)
+        self.assertIn("Line 4: correct_answer is not a string", err)
+        self.assertIn("Line 5: hint is not a string", err)
+        self.assertIn("Line 6: correct_answer: Ensure this value has at most 100 characters", err)
+        self.assertIn("Line 7: level_number is not an integer", err)
+        self.assertIn("Line 8: image_1_url: Enter a valid URL.", err)
+
+    def test_level_taken_during_the_import_is_not_counted_as_created(self):
+        real_bulk_create = PuzzleLevel.objects.bulk_create
+
+        def generated_meanwhile(objs, **kwargs):
+            # A level generated by Celery between reading the state and inserting
+            PuzzleLevel.objects.create(**level(3, 'Mona Lisa'))
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(PuzzleLevel.objects, 'bulk_create', side_effect=generated_meanwhile):
+            out, err = self.import_levels([level(3, 'Big Ben'), level(4, 'Taj Mahal')])
+
+        self.assertEqual(self.answers(), {1: 'Bill Gates', 2: 'Eiffel Tower', 3: 'Mona Lisa', 4: 'Taj Mahal'})
+        self.assertIn("1 created, 0 updated, 0 skipped, 0 duplicates, 0 invalid, 1 conflicts", out)
+        self.assertIn("Level 3 was created by someone else during the import", err)
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReadReplicaRouterTests(TestCase):
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        db_routers._down_until.clear()
+        self.addCleanup(db_routers._down_until.clear)
+
+    # The two test databases are separate and nothing replicates between them,
+    # so a row written to 'default' is only visible when reading from 'default'
+
+    def test_puzzle_reads_go_to_the_replica(self):
+        puzzle = PuzzleLevel.objects.create(**level(1, 'Big Ben'))
+        self.assertEqual(puzzle._state.db, 'default')
+        self.assertFalse(PuzzleLevel.objects.exists())
+
+        session = SessionStore()
+        session['visited'] = True
+        session.save()
+        self.assertTrue(Session.objects.filter(session_key=session.session_key).exists())
+
+    def test_context_managers_change_the_routing(self):
+        PuzzleLevel.objects.create(**level(1, 'Big Ben'))
+        User.objects.create_user('amy')
+
+        with pinned_to_primary():
+            self.assertTrue(PuzzleLevel.objects.exists())
+        with reading_from_replica():
+            self.assertFalse(User.objects.exists())
+            self.assertEqual(router.db_for_write(User), 'default')
+        self.assertTrue(User.objects.exists())
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        replica = connections['replica_1']
+        with mock.patch.object(replica, 'ensure_connection', side_effect=OperationalError("down")) as connect:
+            self.assertEqual(PuzzleLevel.objects.all().db, 'default')
+            # Skipped for DATABASE_REPLICA_RETRY_SECONDS instead of retried on every query
+            self.assertEqual(PuzzleLevel.objects.all().db, 'default')
+        self.assertEqual(connect.call_count, 1)
+
+    def test_admin_list_after_a_save_reads_from_the_primary(self):
+        puzzle = PuzzleLevel.objects.create(**level(1, 'Big Ben'))
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+
+        data = {field: getattr(puzzle, field) or '' for field in (
+            'level_number', 'image_1_url', 'image_2_url', 'correct_answer', 'category', 'hint'
+        )}
+        data['correct_answer'] = 'Mona Lisa'
+        response = self.client.post(f'/admin/rebux/puzzlelevel/{puzzle.pk}/change/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.client.session[PuzzleLevelAdmin.READ_PRIMARY_KEY])
+
+        with mock.patch('rebux.admin.pinned_to_primary', wraps=pinned_to_primary) as pinned:
+            self.client.get('/admin/rebux/puzzlelevel/')
+            self.client.get('/admin/rebux/puzzlelevel/')
+        # Only the first list page after the save
+        self.assertEqual(pinned.call_count, 1)
+
+    @override_settings(PUZZLE_CACHE_SECONDS=3600)
+    def test_cached_puzzles_come_from_the_primary(self):
+        self.addCleanup(cache.clear)
+        # The replica still has the level as it was before an admin fixed it
+        PuzzleLevel.objects.using('replica_1').create(**level(1, 'Old Answer'))
+        PuzzleLevel.objects.create(**level(1, 'New Answer'))
+
+        current, _ = get_puzzles(1)
+
+        self.assertEqual(current.correct_answer, 'New Answer')
+        self.assertEqual(get_puzzles(1)[0].correct_answer, 'New Answer')
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import GenerateLevelsView, PlayGameView, WinGameView
+from .views import GameAPIView, GenerateLevelsView, LeaderboardView, PlayGameView, WinGameView
 
 urlpatterns = [
     path('', PlayGameView.as_view(), name='play_game'),
     path('win/', WinGameView.as_view(), name='win_game'),
     path('generate-levels/', GenerateLevelsView.as_view(), name='generate_levels'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('game/', GameAPIView.as_view(), name='game_api'),
 ]
\ No newline at end of file
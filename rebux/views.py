@@ -1,31 +1,88 @@
+import json
+
+import redis
+from django.conf import settings
 from django.views.generic import FormView, TemplateView, View
+from django.http import JsonResponse
 from django.shortcuts import redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 
 from rebux.tasks import generate_new_levels
+from . import leaderboard
 from .models import PuzzleLevel
 from .forms import GuessForm
+from .puzzle_cache import get_puzzles
 
-class PlayGameView(FormView):
-    template_name = 'rebux/play.html'
-    form_class = GuessForm
-    success_url = reverse_lazy('play_game')
-
-    def dispatch(self, request, *args, **kwargs):
+class GameSessionMixin:
+    """
+    Session-backed game state shared by the HTML game page and the JSON API.
+    """
+    def load_game(self, request):
         # 1. THE FIX: Use Django Sessions instead of a hardcoded User profile
         if 'current_level' not in request.session:
-            request.session['current_level'] = 1
-            request.session['score'] = 0
+            # Logged-in players carry on from their saved progress
+            if request.user.is_authenticated:
+                level, score = leaderboard.saved_progress(request.user)
+            else:
+                level, score = 1, 0
+            request.session['current_level'] = level
+            request.session['score'] = score
             request.session['failed_attempts'] = 0 # Track failures
 
         self.current_level = request.session['current_level']
         self.score = request.session['score']
         self.failed_attempts = request.session.get('failed_attempts', 0)
+
+        # 2. Fetch their personal level and the one after it (for prefetching), usually from cache
+        self.current_puzzle, self.next_puzzle = get_puzzles(self.current_level)
+
+    def submit_guess(self, guess):
+        """
+        Checks the guess and updates the session. Returns True if it was correct.
+        """
+        session = self.request.session
+
+        if not self.current_puzzle.check_answer(guess):
+            # They guessed wrong. Increase the failure counter!
+            session['failed_attempts'] = session.get('failed_attempts', 0) + 1
+            session.modified = True
+            self.failed_attempts = session['failed_attempts']
+            return False
+
+        # 4. Correct! Update their private browser session
+        session['current_level'] += 1
+        session['score'] += 100
+        session['failed_attempts'] = 0 # Reset failures for the next level!
+        session.modified = True 
+
+        # Push the new score into the global ranking (one ZADD, no DB write)
+        leaderboard.record_score(
+            leaderboard.player_id(self.request),
+            leaderboard.player_name(self.request),
+            session['score'],
+            session['current_level'],
+        )
         
-        # 2. Check if a puzzle exists for their personal level
-        try:
-            self.current_puzzle = PuzzleLevel.objects.get(level_number=self.current_level)
-        except PuzzleLevel.DoesNotExist:
+        total_levels = PuzzleLevel.objects.count()
+        levels_remaining = total_levels - session['current_level']
+        
+        if levels_remaining < 3:
+            # from .tasks import generate_new_levels
+            generate_new_levels.delay(2)
+            # generate_new_levels(3)
+
+        return True
+
+class PlayGameView(GameSessionMixin, FormView):
+    template_name = 'rebux/play.html'
+    form_class = GuessForm
+    success_url = reverse_lazy('play_game')
+
+    def dispatch(self, request, *args, **kwargs):
+        self.load_game(request)
+
+        # Check if a puzzle exists for their personal level
+        if self.current_puzzle is None:
             return redirect('win_game')
             
         return super().dispatch(request, *args, **kwargs)
@@ -34,8 +91,10 @@ class PlayGameView(FormView):
         # 3. Pass their specific session data into the HTML template
         context = super().get_context_data(**kwargs)
         context['puzzle'] = self.current_puzzle
+        context['next_puzzle'] = self.next_puzzle
         context['level'] = self.current_level
         context['score'] = self.score
+        context['cache_seconds'] = settings.PUZZLE_CACHE_SECONDS
         
         # If they failed 3 or more times, pass the hint flag to the frontend
         if self.failed_attempts >= 3:
@@ -44,31 +103,76 @@ class PlayGameView(FormView):
         return context
 
     def form_valid(self, form):
-        guess = form.cleaned_data['guess']
-        
-        if self.current_puzzle.check_answer(guess):
-            # 4. Correct! Update their private browser session
-            self.request.session['current_level'] += 1
-            self.request.session['score'] += 100
-            self.request.session['failed_attempts'] = 0 # Reset failures for the next level!
-            self.request.session.modified = True 
-            
-            total_levels = PuzzleLevel.objects.count()
-            levels_remaining = total_levels - self.request.session['current_level']
-            
-            if levels_remaining < 3:
-                # from .tasks import generate_new_levels
-                generate_new_levels.delay(2)
-                # generate_new_levels(3)
-                
+        if self.submit_guess(form.cleaned_data['guess']):
             return super().form_valid(form)
+
+        context = self.get_context_data(form=form, message="Incorrect! Try again.")
+        return self.render_to_response(context)
+
+def puzzle_images(puzzle):
+    if puzzle is None:
+        return []
+    return [url for url in (puzzle.image_1_url, puzzle.image_2_url) if url]
+
+class GameAPIView(GameSessionMixin, View):
+    """
+    JSON version of the game loop for the play page script.
+    GET returns the current level; POST {"guess": "..."} checks a guess and
+    returns the (possibly new) level. Both include the images of the level
+    after it so the browser can fetch them before the player gets there.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        self.load_game(request)
+        return super().dispatch(request, *args, **kwargs)
+
+    def game_state(self):
+        if self.current_puzzle is None:
+            return {'finished': True, 'redirect': reverse('win_game'), 'score': self.score}
+
+        state = {
+            'finished': False,
+            'level': self.current_level,
+            'score': self.score,
+            'category': self.current_puzzle.category,
+            'images': puzzle_images(self.current_puzzle),
+            'next_images': puzzle_images(self.next_puzzle),
+            'show_hint': self.failed_attempts >= 3,
+        }
+        if state['show_hint']:
+            state['hint'] = self.current_puzzle.hint
+        return state
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(self.game_state())
+
+    def post(self, request, *args, **kwargs):
+        if self.current_puzzle is None:
+            return JsonResponse(self.game_state())
+
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return JsonResponse({'error': 'Body must be a JSON object.'}, status=400)
         else:
-            # They guessed wrong. Increase the failure counter!
-            self.request.session['failed_attempts'] = self.request.session.get('failed_attempts', 0) + 1
-            self.request.session.modified = True
-            
-            context = self.get_context_data(form=form, message="Incorrect! Try again.")
-            return self.render_to_response(context)
+            data = request.POST
+
+        form = GuessForm(data)
+        if not form.is_valid():
+            return JsonResponse({'error': 'Invalid guess.', 'errors': form.errors}, status=400)
+
+        correct = self.submit_guess(form.cleaned_data['guess'])
+        if correct:
+            # Move on to the new level (and the one after it for prefetching)
+            self.load_game(request)
+
+        state = self.game_state()
+        state['correct'] = correct
+        if not correct:
+            state['message'] = "Incorrect! Try again."
+        return JsonResponse(state)
 
 class WinGameView(TemplateView):
     template_name = 'rebux/win.html'
@@ -82,4 +186,29 @@ class GenerateLevelsView(View):
     def get(self, request, *args, **kwargs):
         # This view can be triggered manually to generate new levels without Celery
         generate_new_levels.delay(2)
-        return redirect('play_game')
\ No newline at end of file
+        return redirect('play_game')
+
+class LeaderboardView(View):
+    """
+    JSON ranking: the top N players plus the current player's rank and
+    the players right above and below them.
+    """
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), 100)
+            radius = min(max(int(request.GET.get('radius', 3)), 0), 25)
+        except ValueError:
+            return JsonResponse({'error': 'limit and radius must be integers.'}, status=400)
+
+        try:
+            # Read-only: don't create a player id (and a session row) for visitors
+            member = leaderboard.current_player_id(request)
+            me, neighbours = leaderboard.around(member, radius) if member else (None, [])
+            return JsonResponse({
+                'top': leaderboard.top(limit),
+                'me': me,
+                'around_me': neighbours,
+            })
+        except redis.RedisError as e:
+            print(f"Leaderboard read failed: {e}")
+            return JsonResponse({'error': 'Leaderboard is temporarily unavailable.'}, status=503)
@@ -0,0 +1,88 @@
+"""
+Primary/replica routing.
+
+Writes always go to the primary ('default'). Reads of the models listed in
+REPLICA_READ_MODELS (the puzzle catalogue, which only changes when new levels
+are generated) are spread over the replicas in settings.DATABASE_REPLICAS.
+Everything else, sessions included, stays on the primary.
+
+Code that must read its own writes (level generation, admin edit forms) wraps
+itself in pinned_to_primary(); read-only pages that may read any model from a
+replica (admin listings) use reading_from_replica().
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+REPLICA_READ_MODELS = {
+    'rebux.puzzlelevel',
+}
+
+_route = ContextVar('db_route', default=None)
+
+# replica alias -> time.monotonic() until which it is considered down
+_down_until = {}
+
+@contextmanager
+def pinned_to_primary():
+    """Sends every read inside the block to the primary. Also works as a decorator."""
+    token = _route.set('primary')
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+@contextmanager
+def reading_from_replica():
+    """Lets every read inside the block (any model) go to a replica."""
+    token = _route.set('replica')
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+def is_healthy(alias):
+    """
+    Opens (or reuses) the connection to `alias`. A replica that can't be
+    reached is skipped for DATABASE_REPLICA_RETRY_SECONDS, so a dead replica
+    costs one failed connect per process instead of one per query.
+    """
+    now = time.monotonic()
+    if _down_until.get(alias, 0) > now:
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as e:
+        print(f"Replica {alias} is unreachable, reading from the primary: {e}")
+        _down_until[alias] = now + settings.DATABASE_REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+def pick_replica():
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+    return random.choice(replicas) if replicas else 'default'
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        if route == 'primary' or not settings.DATABASE_REPLICAS:
+            return 'default'
+        if route == 'replica' or model._meta.label_lower in REPLICA_READ_MODELS:
+            return pick_replica()
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Real replicas get their schema through replication; locally
+        # `migrate --database=replica_1` can still build a SQLite copy
+        return None
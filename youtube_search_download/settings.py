@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 import dj_database_url
@@ -91,16 +92,74 @@ WSGI_APPLICATION = 'youtube_search_download.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Keep connections open between requests (seconds; 0 = close after every request)
+# and ping them before reuse so a dropped connection is replaced, not reported as an error.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 database_url = os.environ.get("DATABASE_URL")
 if database_url:
-    DATABASES['default'] = dj_database_url.parse(database_url)
+    DATABASES['default'] = dj_database_url.parse(
+        database_url,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+
+# Read replicas: comma-separated URLs, e.g. "postgres://...,postgres://...".
+# Locally two SQLite files work too: DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+# See youtube_search_download/db_routers.py for which queries go to them.
+DATABASE_REPLICAS = []
+raw_replica_urls = os.getenv("DATABASE_REPLICA_URLS", "")
+for replica_url in filter(None, (url.strip() for url in raw_replica_urls.split(','))):
+    alias = f"replica_{len(DATABASE_REPLICAS) + 1}"
+    DATABASES[alias] = dj_database_url.parse(
+        replica_url,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+    # Tests have no real replication, so point replicas at the test primary
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+# `manage.py test` always gets a second, separate test database as 'replica_1',
+# so the router tests (rebux/tests.py) run without DATABASE_REPLICA_URLS. It is
+# left out of DATABASE_REPLICAS; those tests enable it with override_settings.
+if 'test' in sys.argv[1:2] and not DATABASE_REPLICAS:
+    DATABASES['replica_1'] = {**DATABASES['default'], 'TEST': {}}
+
+# How long an unreachable replica is skipped before it is tried again
+DATABASE_REPLICA_RETRY_SECONDS = int(os.getenv("DATABASE_REPLICA_RETRY_SECONDS", "30"))
+
+DATABASE_ROUTERS = ['youtube_search_download.db_routers.ReadReplicaRouter']
+
+# ==========================================
+# CACHE CONFIGURATION
+# ==========================================
+
+# Shared Redis cache in production so every gunicorn worker sees the same entries.
+# Falls back to a per-process memory cache when REDIS_CACHE_URL is not set.
+redis_cache_url = os.getenv("REDIS_CACHE_URL")
+if redis_cache_url:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': redis_cache_url,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 TEMPLATES = [
     {
@@ -167,11 +226,57 @@ UNSPLASH_API_KEY = os.getenv("UNSPLASH_API_KEY")
 GOOGLE_SEARCH_API_KEY = os.getenv("GOOGLE_SEARCH_API_KEY")
 GOOGLE_SEARCH_CX = os.getenv("GOOGLE_SEARCH_CX")
 
+# How long a search result stays fresh (server-side cache and Cache-Control max-age)
+SEARCH_CACHE_SECONDS = int(os.getenv("SEARCH_CACHE_SECONDS", "300"))
+
+# How long a Rebux level (and its rendered puzzle markup) is cached. Edits delete
+# the entries, which only reaches every worker (and Celery) through a shared
+# cache, so caching is off (0) unless REDIS_CACHE_URL is set.
+PUZZLE_CACHE_SECONDS = int(os.getenv("PUZZLE_CACHE_SECONDS", "3600" if redis_cache_url else "0"))
+
+# Search autocomplete: in-memory index per process, topped up from the DB this often
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", "30"))
+AUTOCOMPLETE_MAX_QUERIES = int(os.getenv("AUTOCOMPLETE_MAX_QUERIES", "50000"))
+# ...and reloaded from scratch (the AUTOCOMPLETE_MAX_QUERIES most searched) this often
+AUTOCOMPLETE_RELOAD_SECONDS = int(os.getenv("AUTOCOMPLETE_RELOAD_SECONDS", "3600"))
+AUTOCOMPLETE_MAX_SUGGESTIONS = 10
+
+# Batch (ZIP) downloads: parallel yt-dlp workers per request and max videos per archive
+BATCH_DOWNLOAD_MAX_WORKERS = int(os.getenv("BATCH_DOWNLOAD_MAX_WORKERS", "3"))
+BATCH_DOWNLOAD_MAX_VIDEOS = int(os.getenv("BATCH_DOWNLOAD_MAX_VIDEOS", "20"))
+
 
 # Celery Configuration Options
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 
+# Nothing reads task return values, so don't store them. A task that needs
+# its result can opt back in with @shared_task(ignore_result=False).
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_RESULT_EXPIRES = 3600
+
+# One queue per workload, each consumed by its own worker profile
+# (see celery_worker.sh), so a long Gemini call never delays short jobs.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'rebux.tasks.generate_new_levels': {'queue': 'llm'},
+    'rebux.tasks.resolve_level_images': {'queue': 'images'},
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-leaderboard': {
+        'task': 'rebux.tasks.flush_leaderboard',
+        'schedule': float(os.getenv("LEADERBOARD_FLUSH_SECONDS", "60")),
+    },
+}
+
+# Rebux leaderboard (Redis sorted set), flushed to PlayerProfile by Celery beat
+LEADERBOARD_REDIS_URL = os.getenv("LEADERBOARD_REDIS_URL", CELERY_BROKER_URL)
+LEADERBOARD_REDIS_TIMEOUT = float(os.getenv("LEADERBOARD_REDIS_TIMEOUT", "0.5"))
+LEADERBOARD_FLUSH_BATCH_SIZE = int(os.getenv("LEADERBOARD_FLUSH_BATCH_SIZE", "500"))
+# Anonymous players idle this long are dropped (defaults to the session lifetime)
+LEADERBOARD_ANONYMOUS_TTL = int(os.getenv("LEADERBOARD_ANONYMOUS_TTL", str(SESSION_COOKIE_AGE)))
+
 # ==========================================
 # RENDER PROXY & COOKIE CONFIGURATION
 # ==========================================
@@ -0,0 +1,33 @@
+"""
+Imports the heavy third-party libraries ahead of time.
+
+The views and tasks import these lazily so that `manage.py` commands and
+workers that never need them start fast. Under gunicorn, calling warm_up()
+in the master (see gunicorn.conf.py) loads them once before forking, and every
+worker then shares the already-imported modules copy-on-write.
+"""
+import importlib
+import time
+
+HEAVY_MODULES = (
+    'yt_dlp',
+    'google.genai',
+    'pydantic',
+    'requests',
+)
+
+def warm_up(modules=HEAVY_MODULES):
+    """
+    Imports `modules` and returns how long each one took, in seconds.
+    A module that fails to import is reported and skipped.
+    """
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Warm-up could not import {name}: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings